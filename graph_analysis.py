@@ -1,18 +1,47 @@
-import sys  # For command-line arguments
+import argparse  # For command-line arguments
+import html  # For unescaping GML strings
+import os  # For environment variables
+import re  # For tokenizing GML files
+import sys  # For detecting batch runs
+from collections import deque  # Queue for BFS
+from concurrent.futures import ProcessPoolExecutor  # Parallel betweenness per component
+from itertools import repeat  # Same approx flag for every worker call
 import networkx as nx  # Graph manipulation library
+import matplotlib
+# Headless backend for batch runs (no terminal, or BATCH set to a true value) unless MPLBACKEND picks one
+BATCH = os.environ.get('BATCH', '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+if BATCH or (not sys.stdout.isatty() and 'MPLBACKEND' not in os.environ):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt  # Plotting library
 import numpy as np  # For numerical operations
+from scipy import sparse  # Sparse adjacency matrices
 from matplotlib.colors import LinearSegmentedColormap  # Color mapping
 
+try:
+    import nx_cugraph  # noqa: F401  Optional GPU backend for networkx
+    GPU_BACKEND = {'backend': 'cugraph'}  # Extra keyword for backend-dispatched calls
+except ImportError:
+    GPU_BACKEND = {}  # Plain CPU networkx
+
+try:
+    from numba import njit, prange  # Optional JIT for the clustering kernel
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False  # Fall back to the sparse matrix product
+    prange = range
+    def njit(*args, **kwargs):
+        return lambda func: func
+
 '''
 SYNTAX TO RUN THE PROGRAM:
 
-python ./graph_analysis.py graph_file.gml --components n --plot [C|N|P] --verify_homophily --verify_balanced_graph --output out_graph_file.gml
+python ./graph_analysis.py graph_file.gml --components n --approx --plot [C|N|P] --verify_homophily --verify_balanced_graph --output out_graph_file.gml --out_png plot.png
 
 DESCRIPTION OF COMMANDS:
 
 graph_file.gml                  : Input GML file representing the graph to analyze.
 --components n                  : Partition the graph into n components (subgraphs/clusters).
+--approx                        : Use sampled (approximate) edge betweenness when partitioning.
 --plot [C|N|P]                  : Plot the graph in different styles:
 C                               : Clustering coefficient.
 N                               : Neighborhood overlap.
@@ -20,14 +49,192 @@ P                               : Color nodes by attribute or default.
 --verify_homophily              : Test for homophily in the graph (nodes with the same color are more likely to be connected).
 --verify_balanced_graph         : Check if the graph is balanced based on edge signs.
 --output out_graph_file.gml     : Save the updated graph with results to the specified output GML file.
+--out_png plot.png              : Save plots to a PNG file instead of showing them (plot_1.png, plot_2.png, ... when there are several).
 '''
-def plot_graph(graph, plot_style):
+
+# Built once, shared by every plot
+BLUE_MAGENTA = LinearSegmentedColormap.from_list("blue_magenta", ["blue", "magenta"])
+# Components smaller than this are not worth pickling to a worker; untuned, not benchmarked on several cores
+PARALLEL_MIN_NODES = 1000
+
+GML_TOKEN = re.compile(r'[\[\]]|"[^"\n]*"|\S+')  # Brackets, single-line quoted strings, bare words
+# Same key and number syntax as networkx's GML reader; anything else falls back to it
+GML_KEY = re.compile(r'[A-Za-z][0-9A-Za-z_]*')
+GML_INT = re.compile(r'[+-]?[0-9]+')
+GML_REAL = re.compile(r'[+-]?(?:[0-9]*\.[0-9]+|[0-9]+\.[0-9]*|INF)(?:[Ee][+-]?[0-9]+)?')
+
+def parse_gml_value(token):
+    if token.startswith('"'):  # Quoted string
+        return html.unescape(token[1:-1])
+    if GML_INT.fullmatch(token):
+        return int(token)
+    if GML_REAL.fullmatch(token):
+        return float(token)
+    raise ValueError(f"invalid GML value {token!r}")
+
+def gml_attrs(block):
+    # Unwrap single values; keys repeated within a block stay lists
+    attrs = {}
+    for key, values in block.items():
+        values = [gml_attrs(value) if isinstance(value, dict) else value for value in values]
+        attrs[key] = values[0] if len(values) == 1 else values
+    return attrs
+
+def fast_read_gml(path):
+    # Single pass over the tokens, emitting nodes and edges as (node, attrs) / (u, v, attrs)
+    try:
+        with open(path, encoding='ascii') as f:  # networkx only reads ASCII GML
+            data = f.read()
+        graph_attrs = {}  # Top-level graph attributes
+        nodes = []
+        edges = []
+        stack = []  # Open [ ... ] blocks, innermost last
+        key = None
+        for match in GML_TOKEN.finditer(data):
+            token = match.group()
+            if key is None:
+                if token == ']':
+                    stack.pop()
+                elif GML_KEY.fullmatch(token):
+                    key = token
+                else:
+                    raise ValueError(f"invalid GML key {token!r}")
+                continue
+            if token == '[':
+                block = {}
+                if len(stack) == 1 and key == 'node':
+                    nodes.append(block)
+                elif len(stack) == 1 and key == 'edge':
+                    edges.append(block)
+                elif stack:  # Nested attribute block, e.g. graphics [ ... ]
+                    stack[-1].setdefault(key, []).append(block)
+                elif key != 'graph':
+                    raise ValueError("expected graph block")
+                stack.append(block if stack else graph_attrs)
+            elif stack:
+                stack[-1].setdefault(key, []).append(parse_gml_value(token))
+            else:
+                raise ValueError("value outside graph block")
+            key = None
+        if stack or key is not None:
+            raise ValueError("unbalanced brackets")
+
+        graph_attrs = gml_attrs(graph_attrs)
+        if graph_attrs.pop('directed', 0) or graph_attrs.pop('multigraph', 0):
+            raise ValueError("only simple undirected graphs")
+        graph = nx.Graph(**graph_attrs)
+        labels = {}  # Node id -> label
+        for attrs in map(gml_attrs, nodes):
+            node_id, node_label = attrs.pop('id'), attrs.pop('label')
+            if node_id in labels or node_label in graph:
+                raise ValueError("duplicate node")
+            labels[node_id] = node_label
+            graph.add_node(node_label, **attrs)
+        for attrs in map(gml_attrs, edges):
+            u, v = labels[attrs.pop('source')], labels[attrs.pop('target')]
+            if graph.has_edge(u, v):
+                raise ValueError("duplicate edge")
+            graph.add_edge(u, v, **attrs)
+        return graph
+    except (ValueError, KeyError, TypeError, IndexError):
+        return nx.read_gml(path)  # Let networkx handle (or report) anything unusual
+
+def get_layout(graph):
+    # Spring layout is the slowest plotting step; callers keep the result while the graph is unchanged
+    return nx.spring_layout(graph, seed=0)  # Fixed seed for reproducible plots
+
+def _collapse_parallel_signs(graph):
+    # One undirected edge per node pair; its sign is 0 when parallel or opposite edges
+    # disagree, since the pair can then never be balanced (to_scipy_sparse_array would add them up)
+    collapsed = nx.Graph()
+    collapsed.add_nodes_from(graph)
+    for u, v, sign in graph.edges(data='sign', default=1):
+        if collapsed.has_edge(u, v) and collapsed[u][v]['sign'] != sign:
+            sign = 0
+        collapsed.add_edge(u, v, sign=sign)
+    return collapsed
+
+def _to_csr(graph):
+    # Flat CSR adjacency as (nodes, indptr, indices, signs); build once per graph state and share it
+    nodes = list(graph.nodes())
+    if not nodes:  # networkx refuses to convert an empty graph
+        return nodes, np.zeros(1, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0)
+    if graph.is_multigraph() or graph.is_directed():  # Symmetric rows, one entry per node pair
+        graph = _collapse_parallel_signs(graph)
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=nodes, weight='sign', format='csr')
+    adjacency.sort_indices()  # Sorted rows for neighbor-list merges
+    return nodes, adjacency.indptr, adjacency.indices, adjacency.data
+
+@njit(parallel=True, cache=True)
+def _clustering_csr(indptr, indices):
+    # Per-node clustering from sorted CSR rows, one native loop per node
+    n = indptr.size - 1
+    out = np.zeros(n)
+    for u in prange(n):
+        start, end = indptr[u], indptr[u + 1]
+        degree = end - start
+        if degree < 2:
+            continue
+        t = 0  # Twice the triangles through u
+        for k in range(start, end):
+            v = indices[k]
+            # Two-pointer merge of the neighbor lists of u and v
+            i, j, j_end = start, indptr[v], indptr[v + 1]
+            while i < end and j < j_end:
+                if indices[i] < indices[j]:
+                    i += 1
+                elif indices[i] > indices[j]:
+                    j += 1
+                else:
+                    t += 1
+                    i += 1
+                    j += 1
+        out[u] = t / (degree * (degree - 1))
+    return out
+
+def _strip_self_loops(indptr, indices):
+    # CSR rows without their diagonal entries
+    rows = np.repeat(np.arange(indptr.size - 1), np.diff(indptr))  # Source node of each entry
+    keep = rows != indices
+    counts = np.bincount(rows[keep], minlength=indptr.size - 1)
+    return np.concatenate(([0], np.cumsum(counts))).astype(indptr.dtype), indices[keep]
+
+def clustering_coefficients(graph, csr=None):
+    if graph.is_directed():  # Directed clustering counts edge directions, which the CSR drops
+        clustering = nx.clustering(graph)
+        return np.fromiter((clustering[node] for node in graph), dtype=np.float64, count=len(graph))
+    nodes, indptr, indices, _ = csr if csr is not None else _to_csr(graph)
+    indptr, indices = _strip_self_loops(indptr, indices)  # Self-loops close no triangles, as in nx.clustering
+    if HAVE_NUMBA:
+        return _clustering_csr(indptr, indices)
+    adjacency = sparse.csr_array((np.ones(indices.size), indices, indptr), shape=(len(nodes), len(nodes)))
+    triangles = (adjacency @ adjacency).multiply(adjacency).sum(axis=1) / 2  # Triangles through each node
+    degrees = np.diff(indptr)
+    possible = degrees * (degrees - 1) / 2  # Neighbor pairs that could be linked
+    return np.divide(triangles, possible, out=np.zeros(len(nodes)), where=possible > 0)
+
+def png_paths(out_png, count):
+    # One output path per plot, numbered stem_1.png, stem_2.png, ... when a run makes several
+    if not out_png or count == 1:
+        return [out_png] * count
+    stem, ext = os.path.splitext(out_png)
+    return [f"{stem}_{i}{ext}" for i in range(1, count + 1)]
+
+def show_plot(out_png=None):
+    # Save to a PNG when given one, otherwise open a window
+    if out_png:
+        plt.savefig(out_png, dpi=120)
+        plt.clf()
+    else:
+        plt.show()
+
+def plot_graph(graph, plot_style, pos=None, out_png=None):
     # Get positions for nodes
-    pos = nx.spring_layout(graph)
+    if pos is None:
+        pos = get_layout(graph)
     
     if plot_style == 'C':  # Clustering coefficient
-        clustering = nx.clustering(graph)  # Get clustering coefficients
-        node_colors = [clustering[node] for node in graph.nodes()]
+        node_colors = clustering_coefficients(graph)  # Get clustering coefficients, in node order
         nx.draw(graph, pos, node_color=node_colors, with_labels=True, cmap='Blues')
         
     elif plot_style == 'N':  # Neighborhood overlap
@@ -39,80 +246,189 @@ def plot_graph(graph, plot_style):
         node_colors = apply_blue_to_magenta_colormap(graph)  # Use your existing color mapping
         nx.draw(graph, pos, node_color=node_colors, with_labels=True)
     
-    plt.show()
+    show_plot(out_png)
 
 def apply_blue_to_magenta_colormap(graph):
-    colors = np.linspace(0, 1, len(graph.nodes()))  # Generate colors
-    colormap = LinearSegmentedColormap.from_list("blue_magenta", ["blue", "magenta"])
-    degrees = dict(graph.degree())  # Get node degrees
-    max_degree = max(degrees.values())  # Find max degree
-    # Map node degrees to colors
-    node_colors = [colormap(degrees[node] / max_degree if max_degree > 0 else 0) for node in graph.nodes()]
-
-    return node_colors  # Return list of node colors
+    # Get node degrees in one pass, in node order; graph.degree counts self-loops twice,
+    # every parallel edge, and in+out edges of a directed graph
+    degrees = np.fromiter((d for _, d in graph.degree), dtype=np.float64, count=len(graph))
+    max_degree = degrees.max(initial=0)  # Find max degree, 0 for an empty graph
+    # Map node degrees to colors in one colormap call
+    ratios = degrees / max_degree if max_degree > 0 else degrees  # All zeros when there are no edges
+    return BLUE_MAGENTA(ratios)  # Return (N, 4) array of RGBA node colors
 
 def is_graph_balanced(graph):
-    for cycle in nx.simple_cycles(graph):
-        if len(cycle) % 2 == 1:  # If cycle length is odd
-            # Count negative edges in the cycle
-            negative_edges = sum(1 for u, v in zip(cycle, cycle[1:] + cycle[:1])
-                                  if graph[u][v].get('sign', 1) == -1)
-            if negative_edges % 2 == 1:  # If odd negative edges
-                return False  # Not balanced
+    # Balanced iff nodes can be split into two camps: + edges inside, - edges across
+    if graph.is_multigraph() or graph.is_directed():  # One undirected edge per node pair
+        graph = _collapse_parallel_signs(graph)
+    label = {}  # Camp (0 or 1) of each visited node
+    for root in graph:  # Every unvisited node starts a new component
+        if root in label:
+            continue
+        label[root] = 0
+        queue = deque([root])
+        while queue:  # BFS over the component
+            v = queue.popleft()
+            for w, data in graph[v].items():
+                sign = data.get('sign', 1)
+                if sign == 0:  # Positive and negative edges between the same pair
+                    return False  # Not balanced
+                # Same camp across a positive edge, opposite camp across a negative one
+                w_label = label[v] ^ (0 if sign == 1 else 1)
+                if w not in label:
+                    label[w] = w_label
+                    queue.append(w)
+                elif label[w] != w_label:  # Conflicting camps
+                    return False  # Not balanced
     return True  # Balanced
 
 # Is balanced by node attributes
-def is_graph_balanced_by_node_attributes(graph, attribute):
-    for u, v, data in graph.edges(data=True):  # Get edges with data
-        if attribute in graph.nodes[u] and attribute in graph.nodes[v]:
-            node_u_attr = graph.nodes[u][attribute]  # Get node u's attribute
-            node_v_attr = graph.nodes[v][attribute]  # Get node v's attribute
-            if node_u_attr == node_v_attr:
-                if data.get('sign', 1) != 1:  # Check sign
-                    return False  # Not balanced
+def is_graph_balanced_by_node_attributes(graph, attribute, csr=None):
+    # Signs come from the CSR, so no per-edge attribute dict is touched
+    nodes, indptr, indices, signs = csr if csr is not None else _to_csr(graph)
+    node_attrs = graph.nodes
+    # One lookup per node; filled one element at a time so list values stay single objects
+    attrs = np.empty(len(nodes), dtype=object)
+    for i, node in enumerate(nodes):
+        attrs[i] = node_attrs[node].get(attribute)
+    has_attr = np.fromiter((attribute in node_attrs[node] for node in nodes), dtype=bool, count=len(nodes))
+    rows = np.repeat(np.arange(len(nodes)), np.diff(indptr))  # Source node of each CSR entry
+    same = (attrs[rows] == attrs[indices]).astype(bool)
+    # Both nodes must have the attribute; same attribute needs a positive edge, different a negative one
+    ok = has_attr[rows] & has_attr[indices] & ((same & (signs == 1)) | (~same & (signs == -1)))
+    return not np.any(~ok)  # Balanced if no edge breaks the rule
+
+def subgraph_edge_betweenness(subgraph, approx=False):
+    # Raw (unnormalized) scores so they compare across components
+    n = subgraph.number_of_nodes()
+    # Approximate from a sample of sqrt(n) sources (at least 50), exact for small components
+    sample = {'k': min(n, max(50, int(n ** 0.5))), 'seed': 0} if approx else {}
+    return nx.edge_betweenness_centrality(subgraph, normalized=False, **sample, **GPU_BACKEND)
+
+def ordered_subgraph(graph, nodes, node_position):
+    # Copy of the induced subgraph in the graph's own node order; graph.subgraph() follows
+    # set order, which changes between runs and would make betweenness ties random
+    ordered = sorted(nodes, key=node_position.__getitem__)
+    subgraph = graph.__class__()  # Keeps parallel edges of a MultiGraph
+    subgraph.add_nodes_from((node, graph.nodes[node]) for node in ordered)
+    if graph.is_multigraph():
+        subgraph.add_edges_from(graph.edges(ordered, keys=True, data=True))
+    else:
+        subgraph.add_edges_from(graph.edges(ordered, data=True))
+    return subgraph
+
+def components_edge_betweenness(graph, components, approx, executor, node_position):
+    # Components are independent, so batches with several large ones are spread over worker processes
+    subgraphs = [ordered_subgraph(graph, c, node_position) for c in components]
+    parallel = (os.cpu_count() or 1) > 1 and not GPU_BACKEND  # One CPU gains nothing from workers
+    # Workers only help when at least two large components can run at the same time
+    if parallel and sum(len(c) >= PARALLEL_MIN_NODES for c in components) >= 2:
+        return list(executor.map(subgraph_edge_betweenness, subgraphs, repeat(approx)))
+    return [subgraph_edge_betweenness(subgraph, approx) for subgraph in subgraphs]
+
+def split_until(graph, components, approx=False):
+    # Ties go to the edge listed first in graph.edges(), like max() over the full graph did
+    # MultiGraph betweenness is keyed (u, v, key)
+    edges = graph.edges(keys=True) if graph.is_multigraph() else graph.edges()
+    edge_position = {edge: i for i, edge in enumerate(edges)}
+    node_position = {node: i for i, node in enumerate(graph)}  # For ordering component copies
+
+    def position(edge):
+        # A backend may report an edge as (v, u) instead of the graph's (u, v)
+        if edge in edge_position:
+            return edge_position[edge]
+        return edge_position[(edge[1], edge[0]) + tuple(edge[2:])]
+
+    def best_edges(component_list, executor):
+        # (score, -position, edge) of the top edge in each component, skipping edgeless ones
+        best = {}
+        scores = components_edge_betweenness(graph, component_list, approx, executor, node_position)
+        for nodes, bc in zip(component_list, scores):
+            if not bc:
+                continue
+            if GPU_BACKEND:  # nx-cugraph does not promise the parent's edge order, so break ties explicitly
+                edge = max(bc, key=lambda e: (bc[e], -position(e)))
             else:
-                if data.get('sign', 1) != -1:
-                    return False
-        else:
-            return False  # One or both nodes lack attribute
-    return True  # Balanced graph
+                # bc follows the parent's edge order, so the first maximum is also the earliest edge
+                keys = list(bc)
+                edge = keys[int(np.fromiter(bc.values(), np.float64, count=len(bc)).argmax())]
+            best[nodes] = (bc[edge], -position(edge), edge)
+        return best
+
+    # Workers only start once a batch has two components large enough to send to them
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        # Best edge cached per component; only the component that lost an edge is recomputed
+        initial = [frozenset(c) for c in nx.connected_components(graph, **GPU_BACKEND)]
+        comp_best = best_edges(initial, executor)
+        num_components = len(initial)
+        while num_components < components:  # Nothing is removed if there are enough components already
+            if not comp_best:
+                break  # No edges left to remove
+            # Highest betweenness edge over all components, one comparison per component
+            nodes = max(comp_best, key=lambda c: comp_best[c][:2])
+            highest_edge = comp_best.pop(nodes)[2]
+            graph.remove_edge(*highest_edge)  # Remove highest edge
+            u, v = highest_edge[:2]
+            # Only the component that lost the edge can have split, and only if u and v got separated
+            u_component = frozenset(nx.node_connected_component(graph, u))
+            if v in u_component:
+                sub_components = [nodes]  # Not a bridge, component count unchanged
+            else:
+                sub_components = [u_component, nodes - u_component]
+                num_components += 1
+            comp_best.update(best_edges(sub_components, executor))
+    return graph
+
+def write_gml(graph, path):
+    # nx.write_gml's loop with a 1 MiB buffer: still one write() per line, but far fewer syscalls
+    with open(path, 'wb', buffering=1 << 20) as f:
+        for line in nx.generate_gml(graph):
+            f.write((line + '\n').encode())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a graph stored in a GML file.")
+    parser.add_argument('graph', help="Input GML file representing the graph to analyze.")
+    parser.add_argument('--components', type=int, help="Partition the graph into n components.")
+    parser.add_argument('--approx', action='store_true',
+                        help="Use sampled (approximate) edge betweenness with --components.")
+    parser.add_argument('--plot', choices=['C', 'N', 'P'],
+                        help="Plot by clustering coefficient (C), neighborhood overlap (N) or attribute (P).")
+    parser.add_argument('--verify_homophily', action='store_true', help="Test for homophily in the graph.")
+    parser.add_argument('--verify_balanced_graph', action='store_true', help="Check if the graph is balanced.")
+    parser.add_argument('--output', help="Save the updated graph to the specified output GML file.")
+    parser.add_argument('--out_png', '--out-png', help="Save plots to this PNG file instead of showing them, numbered when there are several.")
+    return parser.parse_args(argv)
 
 def main():
-    if len(sys.argv) < 2:  # Check for input graph file
-        print("Error. Input invalid")
-        sys.exit(1)  # Exit if not provided
-    
-    input_graph_file = sys.argv[1]
-    plot_style = None
-    verify_homophily = False
-    verify_balanced_graph = False
-    components = None
-
-    # Manual parsing of command-line arguments
-    for i in range(2, len(sys.argv)):
-        if sys.argv[i] == '--plot':
-            plot_style = sys.argv[i + 1]
-        elif sys.argv[i] == '--verify_homophily':
-            verify_homophily = True
-        elif sys.argv[i] == '--verify_balanced_graph':
-            verify_balanced_graph = True
-        elif sys.argv[i] == '--components':
-            components = int(sys.argv[i + 1])
-
-    graph = nx.read_gml(input_graph_file)  # Load graph from GML file
+    args = parse_args()
+    input_graph_file = args.graph
+    plot_style = args.plot
+    verify_homophily = args.verify_homophily
+    verify_balanced_graph = args.verify_balanced_graph
+    components = args.components
+
+    if not (components or plot_style or verify_homophily or verify_balanced_graph or args.output):
+        return  # Nothing to do, skip loading the graph
+
+    graph = fast_read_gml(input_graph_file)  # Load graph from GML file
     
-    # Set edge signs based on color
-    for u, v, data in graph.edges(data=True):
-        # Red is -1, else +1
-        data['sign'] = -1 if data.get('color') == 'r' else 1
+    # Set edge signs based on color: red is -1, else +1
+    if graph.is_multigraph():  # nx.read_gml fallback; edges are keyed (u, v, key)
+        signs = {(u, v, k): -1 if data.get('color') == 'r' else 1 for u, v, k, data in graph.edges(keys=True, data=True)}
+    else:
+        signs = {(u, v): -1 if data.get('color') == 'r' else 1 for u, v, data in graph.edges(data=True)}
+    nx.set_edge_attributes(graph, signs, name='sign')
+    pos = None  # Node positions, laid out on first use and again if the graph changes
+    plot_count = sum(map(bool, (verify_homophily or verify_balanced_graph, components, plot_style)))
+    out_pngs = iter(png_paths(args.out_png, plot_count))  # Next PNG path for each plot, in order
 
     # Draw the graph if needed
     if verify_homophily or verify_balanced_graph:
         node_colors = apply_blue_to_magenta_colormap(graph)  # Get colors for nodes
-        pos = nx.spring_layout(graph)  # Position nodes
+        pos = get_layout(graph)  # Position nodes
         # Draw graph
         nx.draw(graph, pos, node_color=node_colors, with_labels=True)
-        plt.show()
+        show_plot(next(out_pngs))
 
     if verify_balanced_graph:
         is_balanced = is_graph_balanced(graph)  # Check balance
@@ -123,16 +439,20 @@ def main():
 
     if verify_homophily:
         try:
-            homophily_graph = nx.read_gml('homophily.gml')  # Load homophily graph
-            color_map = {node: data['color'] for node, data in homophily_graph.nodes(data=True)}
-            same_color_edges = 0  # Count same color edges
-            different_color_edges = 0  # Count diff color edges
-            # Check edges in graph
-            for u, v in graph.edges():
-                if color_map[u] == color_map[v]:  # If same color
-                    same_color_edges += 1  # Increment count
-                else:
-                    different_color_edges += 1
+            homophily_graph = fast_read_gml('homophily.gml')  # Load homophily graph
+            color_map = {node: data['color'] for node, data in homophily_graph.nodes(data=True)
+                         if data.get('color') is not None}
+            # Integer code per node so edges can be compared as arrays
+            color_codes = {}  # Color -> int
+            idx = {node: i for i, node in enumerate(color_map)}
+            codes = np.fromiter((color_codes.setdefault(color, len(color_codes)) for color in color_map.values()),
+                                dtype=np.int64, count=len(idx))
+            # Check edges in graph, skipping nodes without a color
+            colored_edges = [(idx[u], idx[v]) for u, v in graph.edges() if u in idx and v in idx]
+            eu = np.fromiter((u for u, _ in colored_edges), dtype=np.int64, count=len(colored_edges))
+            ev = np.fromiter((v for _, v in colored_edges), dtype=np.int64, count=len(colored_edges))
+            same_color_edges = int((codes[eu] == codes[ev]).sum())  # Count same color edges
+            different_color_edges = eu.size - same_color_edges  # Count diff color edges
             # Total edges
             total_edges = same_color_edges + different_color_edges
             if total_edges > 0:
@@ -144,19 +464,18 @@ def main():
             print("Error: homophily.gml file not found.")
 
     if components:
-        while True:
-            edge_betweenness = nx.edge_betweenness_centrality(graph)  # Get edge betweenness
-            highest_edge = max(edge_betweenness, key=edge_betweenness.get)  # Find highest edge
-            graph.remove_edge(*highest_edge)  # Remove highest edge
-            components_list = list(nx.connected_components(graph))  # Get connected components
-            num_components = len(components_list)
-            if num_components >= components:
-                break
+        split_until(graph, components, args.approx)  # Remove edges until graph splits
         # Get colors for nodes
         node_colors = apply_blue_to_magenta_colormap(graph)
-        pos = nx.spring_layout(graph)
+        pos = get_layout(graph)  # Laid out once, after all removals
         nx.draw(graph, pos, node_color=node_colors, with_labels=True)
-        plt.show()
+        show_plot(next(out_pngs))
+
+    if plot_style:
+        plot_graph(graph, plot_style, pos, next(out_pngs))  # Reuses the last layout when there is one
+
+    if args.output:
+        write_gml(graph, args.output)  # Save updated graph
 
 if __name__ == '__main__':
     main()